@@ -6,13 +6,19 @@ from typing import List, Optional, Dict, Any
 import json
 import pandas as pd
 import numpy as np
-from sentence_transformers import SentenceTransformer
-import faiss
-import openai
 import os
 from dotenv import load_dotenv
-import re
 import logging
+import hashlib
+import asyncio
+import sys
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from functools import reduce
+from statistics import fmean
+
+# torch, sentence_transformers, faiss, onnxruntime and openai are
+# imported where they are used so workers that skip semantic search never load them
 
 # Load environment variables
 load_dotenv()
@@ -36,55 +42,503 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Employee data and on-disk index cache locations
+EMPLOYEES_FILE = 'employees_data.json'
+INDEX_CACHE_DIR = os.getenv('INDEX_CACHE_DIR', '.index_cache')
+INDEX_FILE = os.path.join(INDEX_CACHE_DIR, 'index.faiss')
+EMBEDDINGS_FILE = os.path.join(INDEX_CACHE_DIR, 'emb.npy')
+META_FILE = os.path.join(INDEX_CACHE_DIR, 'meta.json')
+
+# Bump when create_employee_text changes so cached embeddings are rebuilt
+EMPLOYEE_TEXT_VERSION = 2
+
+# Below this many employees an exact NumPy matmul beats FAISS call overhead,
+# so no FAISS index is built
+NUMPY_SEARCH_MAX_EMPLOYEES = 10_000
+
+# HNSW graph parameters for semantic search
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# IVF+PQ parameters, used instead of HNSW for very large datasets
+# (well above the IVF_NLIST * 39 vectors needed to train the quantizers)
+IVF_NLIST = 256
+PQ_M = 48
+PQ_NBITS = 8
+IVF_NPROBE = 16
+IVFPQ_MIN_EMPLOYEES = 100_000
+
+# Minimum cosine similarity for a semantic search match
+SIMILARITY_THRESHOLD = 0.3
+
+# Batch size used when encoding employee texts
+ENCODE_BATCH_SIZE = 64
+
+# Cache sizes for repeated chat queries
+QUERY_CACHE_SIZE = 4096
+RESPONSE_CACHE_SIZE = 1024
+
+# Micro-batching window for concurrent chat queries
+BATCH_MAX_SIZE = 32
+BATCH_MAX_WAIT = 0.005
+
+# PyTorch thread pools for CPU inference
+TORCH_NUM_THREADS = int(os.getenv('TORCH_NUM_THREADS', os.cpu_count() or 1))
+TORCH_INTEROP_THREADS = 2
+
+# FAISS OpenMP threads: single queries run serially, batches fan out
+FAISS_BATCH_THREADS = TORCH_NUM_THREADS
+
+# Set to 0 for lightweight workers that only serve /employees and /stats
+ENABLE_SEMANTIC_SEARCH = os.getenv('ENABLE_SEMANTIC_SEARCH', '1') == '1'
+
+# Sentence embedding model
+MODEL_NAME = 'all-MiniLM-L6-v2'
+HF_MODEL_ID = f'sentence-transformers/{MODEL_NAME}'
+
+# ONNX Runtime INT8 query encoder (used when onnxruntime/optimum are installed)
+USE_ONNX_ENCODER = os.getenv('USE_ONNX_ENCODER', '1') == '1'
+# Exports are stored per model so a different MODEL_NAME never loads a stale export
+ONNX_MODEL_DIR = os.path.join(INDEX_CACHE_DIR, 'onnx', MODEL_NAME)
+ONNX_OPTIMIZED_MODEL_FILE = os.path.join(ONNX_MODEL_DIR, 'model_optimized.onnx')
+ONNX_INT8_MODEL_FILE = os.path.join(ONNX_MODEL_DIR, 'model_optimized.int8.onnx')
+
+
+def export_onnx_model():
+    """Export the model to ONNX, fuse its kernels and quantize weights to INT8 (one-off step)"""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTOptimizer
+    from optimum.onnxruntime.configuration import AutoOptimizationConfig
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    logger.info("Exporting embedding model to ONNX...")
+    ort_model = ORTModelForFeatureExtraction.from_pretrained(HF_MODEL_ID, export=True)
+
+    # O3 fuses LayerNorm, GELU and attention projections into single kernels
+    optimizer = ORTOptimizer.from_pretrained(ort_model)
+    optimizer.optimize(save_dir=ONNX_MODEL_DIR, optimization_config=AutoOptimizationConfig.O3())
+
+    quantize_dynamic(ONNX_OPTIMIZED_MODEL_FILE, ONNX_INT8_MODEL_FILE, weight_type=QuantType.QInt8)
+    logger.info(f"INT8 ONNX model written to {ONNX_INT8_MODEL_FILE}")
+
+
+class OnnxQueryEncoder:
+    """Fused, INT8-quantized ONNX Runtime version of the sentence embedding model"""
+
+    def __init__(self, tokenizer, max_seq_length):
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+        self.session = self.create_session()
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def create_session(self):
+        """Create a CPU inference session with all graph optimizations enabled"""
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = TORCH_NUM_THREADS
+        return ort.InferenceSession(ONNX_INT8_MODEL_FILE, options, providers=['CPUExecutionProvider'])
+
+    def encode(self, texts):
+        """Return mean-pooled, L2-normalized float32 embeddings for texts"""
+        tokens = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors='np'
+        )
+        inputs = {name: tokens[name].astype('int64') for name in self.input_names if name in tokens}
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        # Mean pooling over non-padding tokens, matching SentenceTransformer
+        mask = tokens['attention_mask'][..., None].astype('float32')
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings.astype('float32')
+
+
 # Initialize models and data
 class HRChatbot:
     def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.device = None
+        self.model = None
+        self.tokenizer = None
+        self.query_encoder = None
+        if ENABLE_SEMANTIC_SEARCH:
+            self.setup_model()
+        self.query_cache = OrderedDict()
+        # Searches can run concurrently in worker threads when the batcher is not running
+        self.query_cache_lock = threading.Lock()
+        self.response_cache = OrderedDict()
         self.employees_data = self.load_employee_data()
+        self.employees_by_id = {emp['id']: emp for emp in self.employees_data}
+        self.emp_df = None
+        self.skill_bits = None
+        self.setup_search_index()
+        self.stats = self.compute_stats()
         self.employee_embeddings = None
         self.faiss_index = None
+        self.index_type = self.choose_index_type(len(self.employees_data))
         self.openai_client = None
         self.setup_openai()
-        self.setup_embeddings()
+        if ENABLE_SEMANTIC_SEARCH:
+            self.setup_embeddings()
+
+    def setup_model(self):
+        """Load the sentence embedding model, tokenizer and query encoder"""
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        self.setup_torch_threads()
+        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.model = SentenceTransformer(MODEL_NAME, device=self.device)
+        self.model.eval()
+        if self.device == 'cuda':
+            self.setup_half_precision()
+        self.tokenizer = self.setup_tokenizer()
+        self.query_encoder = self.setup_query_encoder()
+
+    def setup_torch_threads(self):
+        """Use all available cores for intra-op parallelism during encoding"""
+        import torch
+
+        torch.set_num_threads(TORCH_NUM_THREADS)
+        try:
+            torch.set_num_interop_threads(TORCH_INTEROP_THREADS)
+        except RuntimeError:
+            # Inter-op pool can only be sized before the first parallel op
+            logger.warning("PyTorch inter-op threads already initialized")
+        logger.info(f"PyTorch using {torch.get_num_threads()} threads")
+
+    def setup_half_precision(self):
+        """Cast model weights to BF16 (Ampere+) or FP16 for GPU inference"""
+        import torch
+
+        if torch.cuda.is_bf16_supported():
+            self.model.to(torch.bfloat16)
+        else:
+            self.model.half()
+        logger.info(f"Embedding model running on GPU in {next(self.model.parameters()).dtype}")
+
+    def setup_tokenizer(self):
+        """Warm up the model's fast (Rust) tokenizer for query encoding"""
+        tokenizer = self.model.tokenizer
+        tokenizer("warmup", return_tensors='pt')
+        return tokenizer
+
+    def setup_query_encoder(self):
+        """Setup the ONNX Runtime query encoder, falling back to PyTorch"""
+        if self.device == 'cuda':
+            logger.info("Using GPU query encoder")
+            return None
+
+        if not USE_ONNX_ENCODER:
+            logger.info("Using PyTorch query encoder")
+            return None
+
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError:
+            logger.info("onnxruntime not installed, using PyTorch query encoder")
+            return None
+
+        if not os.path.exists(ONNX_INT8_MODEL_FILE):
+            logger.info("No exported ONNX model found (run `python main.py --export-onnx`), using PyTorch query encoder")
+            return None
+
+        try:
+            encoder = OnnxQueryEncoder(self.tokenizer, self.model.max_seq_length)
+            logger.info("ONNX Runtime INT8 query encoder initialized")
+            return encoder
+        except Exception as e:
+            logger.warning(f"ONNX query encoder unavailable, using PyTorch: {e}")
+            return None
 
     def load_employee_data(self):
         """Load employee data from JSON file"""
         try:
-            with open('employees_data.json', 'r') as f:
+            with open(EMPLOYEES_FILE, 'r') as f:
                 data = json.load(f)
             return data['employees']
         except FileNotFoundError:
             logger.error("Employee data file not found")
             return []
 
+    def setup_search_index(self):
+        """Build the columnar employee table and the per-skill employee bitsets"""
+        self.emp_df = pd.DataFrame(self.employees_data)
+        self.skill_bits = {}
+        if self.emp_df.empty:
+            return
+
+        # Lowercase searchable fields once here instead of per request
+        self.emp_df['department_lc'] = self.emp_df['department'].str.lower()
+        self.emp_df['availability_lc'] = self.emp_df['availability'].str.lower()
+
+        skill_rows = defaultdict(list)
+        for row, emp in enumerate(self.employees_data):
+            for skill in {s.lower() for s in emp['skills']}:
+                skill_rows[skill].append(row)
+
+        # One bit per employee, packed 64 employees per uint64 word
+        num_bits = -(-len(self.employees_data) // 64) * 64
+        for skill, rows in skill_rows.items():
+            members = np.zeros(num_bits, dtype=bool)
+            members[rows] = True
+            self.skill_bits[skill] = np.packbits(members, bitorder='little').view('<u8')
+
+    def filter_employees(self, skills=None, experience_min=None, experience_max=None,
+                         department=None, availability=None):
+        """Filter employees by skills (any match), experience, department and availability"""
+        if self.emp_df.empty:
+            return []
+
+        mask = np.ones(len(self.emp_df), dtype=bool)
+
+        if skills:
+            wanted = {skill.lower() for skill in skills}
+            bitsets = [self.skill_bits[skill] for skill in wanted if skill in self.skill_bits]
+            if bitsets:
+                bits = reduce(np.bitwise_or, bitsets)
+                mask &= np.unpackbits(bits.view(np.uint8), bitorder='little')[:len(mask)].astype(bool)
+            else:
+                mask[:] = False
+
+        if experience_min or experience_max:
+            mask &= self.emp_df['experience_years'].between(
+                experience_min or -np.inf,
+                experience_max or np.inf
+            ).to_numpy()
+
+        if department:
+            mask &= self.emp_df['department_lc'].str.contains(department.lower(), regex=False).to_numpy()
+
+        if availability:
+            mask &= (self.emp_df['availability_lc'] == availability.lower()).to_numpy()
+
+        return [self.employees_data[row] for row in np.flatnonzero(mask)]
+
+    def compute_stats(self):
+        """Aggregate department, skill and experience statistics in one pass"""
+        departments = Counter()
+        skills_count = Counter()
+        for emp in self.employees_data:
+            departments[emp['department']] += 1
+            skills_count.update(emp['skills'])
+
+        return {
+            "total_employees": len(self.employees_data),
+            "departments": dict(departments),
+            "top_skills": dict(skills_count.most_common(10)),
+            "avg_experience": fmean(emp['experience_years'] for emp in self.employees_data) if self.employees_data else 0.0
+        }
+
     def setup_openai(self):
         """Setup OpenAI client"""
         api_key = os.getenv('OPENAI_API_KEY')
         if api_key:
-            openai.api_key = api_key
-            self.openai_client =openai
+            import openai
+
+            self.openai_client = openai.AsyncOpenAI(api_key=api_key)
             logger.info("OpenAI client initialized")
         else:
             # self.openai_client = None
             logger.warning("OpenAI API key not found. RAG responses will be template-based.")
 
     def create_employee_text(self, employee):
-        """Create searchable text representation of employee"""
+        """Create compact searchable text representation of employee"""
         skills_text = ", ".join(employee['skills'])
         projects_text = ", ".join(employee['projects'])
         certs_text = ", ".join(employee['certifications'])
 
-        text = f"""
-        Name: {employee['name']}
-        Skills: {skills_text}
-        Experience: {employee['experience_years']} years
-        Projects: {projects_text}
-        Department: {employee['department']}
-        Specialization: {employee['specialization']}
-        Certifications: {certs_text}
-        Availability: {employee['availability']}
-        """
-        return text.strip()
+        text = " ".join([
+            f"Name {employee['name']}",
+            f"Skills {skills_text}",
+            f"Experience {employee['experience_years']} years",
+            f"Projects {projects_text}",
+            f"Department {employee['department']}",
+            f"Specialization {employee['specialization']}",
+            f"Certifications {certs_text}",
+            f"Availability {employee['availability']}"
+        ])
+        return " ".join(text.split()).lower()
+
+    def encode_texts(self, texts):
+        """Encode texts in batches and return normalized float32 embeddings"""
+        import torch
+
+        # encode() already length-sorts its input into batches and restores the order.
+        # Keep the result as a tensor: NumPy cannot represent BF16, so cast to FP32 first.
+        with torch.inference_mode():
+            embeddings = self.model.encode(
+                texts,
+                batch_size=ENCODE_BATCH_SIZE,
+                show_progress_bar=False,
+                convert_to_tensor=True,
+                normalize_embeddings=True
+            )
+        return embeddings.float().cpu().numpy()
+
+    def normalize_query(self, query):
+        """Normalize a query for cache lookups (the model is uncased)"""
+        return " ".join(query.split()).lower()
+
+    def encode_queries(self, queries):
+        """Return (n, d) embeddings for queries, encoding cache misses in one batch"""
+        keys = [self.normalize_query(query) for query in queries]
+        embeddings = {}
+        missing = []
+        with self.query_cache_lock:
+            for key in dict.fromkeys(keys):
+                if key in self.query_cache:
+                    self.query_cache.move_to_end(key)
+                    embeddings[key] = self.query_cache[key]
+                else:
+                    missing.append(key)
+
+        if missing:
+            new_embeddings = self.embed_queries(missing)
+            with self.query_cache_lock:
+                for key, embedding in zip(missing, new_embeddings):
+                    # Cached arrays are shared between requests
+                    embedding.setflags(write=False)
+                    embeddings[key] = embedding
+                    self.cache_put(self.query_cache, key, embedding, QUERY_CACHE_SIZE)
+
+        return np.stack([embeddings[key] for key in keys])
+
+    def embed_queries(self, queries):
+        """Encode queries into normalized (n, d) float32 embeddings"""
+        if self.query_encoder:
+            return self.query_encoder.encode(queries)
+
+        import torch
+
+        # Tokenize directly and run the transformer, bypassing the encode() wrapper
+        tokens = self.tokenizer(
+            queries,
+            padding=True,
+            truncation=True,
+            max_length=self.model.max_seq_length,
+            return_tensors='pt'
+        ).to(self.device)
+
+        with torch.inference_mode():
+            features = {
+                'token_embeddings': self.model[0].auto_model(**tokens).last_hidden_state,
+                'attention_mask': tokens['attention_mask']
+            }
+
+            # Run the model's own Pooling (and Normalize) modules so queries match documents
+            for module in list(self.model)[1:]:
+                features = module(features)
+            embeddings = torch.nn.functional.normalize(features['sentence_embedding'], dim=1)
+
+        return embeddings.float().cpu().numpy()
+
+    def choose_index_type(self, num_employees):
+        """Pick the search backend suited to the number of employees"""
+        if num_employees < NUMPY_SEARCH_MAX_EMPLOYEES:
+            return 'numpy'
+        return 'ivfpq' if num_employees >= IVFPQ_MIN_EMPLOYEES else 'hnsw'
+
+    def build_faiss_index(self, embeddings):
+        """Build a FAISS index over normalized embeddings (inner product == cosine)"""
+        import faiss
+
+        dimension = embeddings.shape[1]
+        if self.index_type == 'ivfpq':
+            quantizer = faiss.IndexFlatIP(dimension)
+            index = faiss.IndexIVFPQ(quantizer, dimension, IVF_NLIST, PQ_M, PQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+            index.train(embeddings)
+        else:
+            index = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.add(embeddings)
+        return index
+
+    def configure_search(self, index):
+        """Apply query-time search parameters for the active index type"""
+        if self.index_type == 'ivfpq':
+            index.nprobe = IVF_NPROBE
+        else:
+            index.hnsw.efSearch = HNSW_EF_SEARCH
+
+    def employees_file_hash(self):
+        """Return the sha256 hex digest of the employee data file"""
+        sha = hashlib.sha256()
+        with open(EMPLOYEES_FILE, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def load_cached_index(self, data_hash):
+        """Load a persisted FAISS index and embeddings if they match the data hash"""
+        required = [EMBEDDINGS_FILE, META_FILE]
+        if self.index_type != 'numpy':
+            required.append(INDEX_FILE)
+        if not all(os.path.exists(p) for p in required):
+            return False
+
+        try:
+            with open(META_FILE, 'r') as f:
+                meta = json.load(f)
+            if (meta.get('data_hash') != data_hash
+                    or meta.get('index_type') != self.index_type
+                    or meta.get('text_version') != EMPLOYEE_TEXT_VERSION
+                    or meta.get('model') != MODEL_NAME
+                    or meta.get('dimension') != self.model.get_sentence_embedding_dimension()):
+                logger.info("Employee data, text format, model or index type changed, rebuilding embeddings")
+                return False
+
+            if self.index_type != 'numpy':
+                import faiss
+
+                # IO_FLAG_MMAP only maps IVF inverted lists; an HNSW index is read fully into RAM
+                self.faiss_index = faiss.read_index(INDEX_FILE, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                self.configure_search(self.faiss_index)
+            # The embedding matrix is memory-mapped and shared through the page cache
+            self.employee_embeddings = np.load(EMBEDDINGS_FILE, mmap_mode='r')
+            logger.info(f"Loaded cached {self.index_type} index with {len(self.employee_embeddings)} employees")
+            return True
+        except Exception as e:
+            logger.warning(f"Could not load cached index, rebuilding: {e}")
+            self.faiss_index = None
+            self.employee_embeddings = None
+            return False
+
+    def save_index(self, data_hash):
+        """Persist the FAISS index, embeddings and data hash to disk"""
+        # Each file is written to a per-process temporary path and atomically
+        # renamed, with meta.json last, so other workers never load a partial file
+        suffix = f'.{os.getpid()}.tmp'
+        try:
+            os.makedirs(INDEX_CACHE_DIR, exist_ok=True)
+
+            if self.faiss_index is not None:
+                import faiss
+
+                faiss.write_index(self.faiss_index, INDEX_FILE + suffix)
+                os.replace(INDEX_FILE + suffix, INDEX_FILE)
+
+            with open(EMBEDDINGS_FILE + suffix, 'wb') as f:
+                np.save(f, self.employee_embeddings)
+            os.replace(EMBEDDINGS_FILE + suffix, EMBEDDINGS_FILE)
+
+            with open(META_FILE + suffix, 'w') as f:
+                json.dump({
+                    'data_hash': data_hash,
+                    'index_type': self.index_type,
+                    'text_version': EMPLOYEE_TEXT_VERSION,
+                    'model': MODEL_NAME,
+                    'dimension': int(self.employee_embeddings.shape[1]),
+                    'count': len(self.employees_data)
+                }, f)
+            os.replace(META_FILE + suffix, META_FILE)
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"Could not persist FAISS index: {e}")
 
     def setup_embeddings(self):
         """Create embeddings for all employees and setup FAISS index"""
@@ -92,76 +546,107 @@ class HRChatbot:
             logger.error("No employee data available for embedding")
             return
 
+        # Reuse the persisted index when the employee data is unchanged
+        data_hash = self.employees_file_hash()
+        if self.load_cached_index(data_hash):
+            return
+
         # Create text representations
         employee_texts = [self.create_employee_text(emp) for emp in self.employees_data]
 
         # Generate embeddings
         logger.info("Generating embeddings for employees...")
-        embeddings = self.model.encode(employee_texts)
+        embeddings = self.encode_texts(employee_texts)
         self.employee_embeddings = embeddings
 
-        # Setup FAISS index
-        dimension = embeddings.shape[1]
-        self.faiss_index = faiss.IndexFlatIP(dimension)  # Inner product similarity
-
-        # Normalize embeddings for cosine similarity
-        faiss.normalize_L2(embeddings)
-        self.faiss_index.add(embeddings.astype('float32'))
+        # Setup FAISS index (small datasets are searched directly with NumPy)
+        if self.index_type != 'numpy':
+            self.faiss_index = self.build_faiss_index(embeddings)
+            self.configure_search(self.faiss_index)
 
-        logger.info(f"FAISS index created with {len(employee_texts)} employees")
+        logger.info(f"{self.index_type} index created with {len(employee_texts)} employees")
+        self.save_index(data_hash)
 
     def search_employees(self, query: str, top_k: int = 5) -> List[Dict]:
         """Search for relevant employees using semantic similarity"""
-        if not self.faiss_index:
-            return []
-
-        # Generate query embedding
-        query_embedding = self.model.encode([query])
-        faiss.normalize_L2(query_embedding)
-
-        # Search in FAISS index
-        scores, indices = self.faiss_index.search(query_embedding.astype('float32'), top_k)
-
-        # Prepare results
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx < len(self.employees_data):
-                employee = self.employees_data[idx].copy()
-                employee['similarity_score'] = float(score)
-                results.append(employee)
-
-        # Filter by minimum similarity threshold
-        results = [emp for emp in results if emp['similarity_score'] > 0.3]
-
-        return results
-
-    def generate_response(self, query: str, relevant_employees: List[Dict]) -> str:
+        return self.search_employees_batch([query], top_k)[0]
+
+    def search_employees_batch(self, queries: List[str], top_k: int = 5) -> List[List[Dict]]:
+        """Search for relevant employees for several queries with one encode and search call"""
+        if self.employee_embeddings is None:
+            return [[] for _ in queries]
+
+        # Generate query embeddings
+        query_embeddings = self.encode_queries(queries)
+
+        # Nearest-neighbour search over employee embeddings
+        scores, indices = self.search_vectors(query_embeddings, top_k)
+
+        return [self.collect_results(row_scores, row_indices) for row_scores, row_indices in zip(scores, indices)]
+
+    def set_faiss_threads(self, num_queries):
+        """Avoid OpenMP fan-out for single queries; parallelize batched searches"""
+        # The OpenMP thread count is per calling thread, so this is set in the
+        # worker thread right before each search
+        import faiss
+
+        faiss.omp_set_num_threads(1 if num_queries == 1 else FAISS_BATCH_THREADS)
+
+    def search_vectors(self, query_embeddings, top_k):
+        """Return FAISS-style (scores, indices) for the top_k employees per query"""
+        if self.faiss_index is not None:
+            self.set_faiss_threads(len(query_embeddings))
+            return self.faiss_index.search(query_embeddings, top_k)
+
+        # Exact cosine scores with a single BLAS matmul on the normalized matrix
+        scores = query_embeddings @ self.employee_embeddings.T
+        k = min(top_k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top_scores, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+    def collect_results(self, scores, indices) -> List[Dict]:
+        """Turn one row of search scores and indices into employee results"""
+        # Apply the similarity threshold before building any result dicts
+        mask = (scores > SIMILARITY_THRESHOLD) & (indices >= 0) & (indices < len(self.employees_data))
+        return [
+            {**self.employees_data[idx], 'similarity_score': score}
+            for score, idx in zip(scores[mask].tolist(), indices[mask].tolist())
+        ]
+
+    async def generate_response(self, query: str, relevant_employees: List[Dict]) -> str:
         """Generate natural language response using retrieved employee data"""
         if not relevant_employees:
             return "I couldn't find any employees matching your criteria. Please try a different search query."
 
         if self.openai_client and os.getenv('OPENAI_API_KEY'):
-            return self.generate_openai_response(query, relevant_employees)
+            return await self.generate_openai_response(query, relevant_employees)
         else:
             return self.generate_template_response(query, relevant_employees)
 
-    def generate_openai_response(self, query: str, employees: List[Dict]) -> str:
+    async def generate_openai_response(self, query: str, employees: List[Dict]) -> str:
         """Generate response using OpenAI GPT"""
+        cache_key = (self.normalize_query(query), tuple(emp['id'] for emp in employees))
+        cached_response = self.response_cache.get(cache_key)
+        if cached_response is not None:
+            self.response_cache.move_to_end(cache_key)
+            return cached_response
+
         try:
             # Prepare context
-            context = "Based on your query, here are the relevant employees:\n\n"
-            for emp in employees:
-                skills_text = ", ".join(emp['skills'])
-                projects_text = ", ".join(emp['projects'])
-                context += f"""
+            context = "Based on your query, here are the relevant employees:\n\n" + "".join(
+                f"""
                 **{emp['name']}** ({emp['experience_years']} years experience)
-                - Skills: {skills_text}
-                - Projects: {projects_text}
+                - Skills: {', '.join(emp['skills'])}
+                - Projects: {', '.join(emp['projects'])}
                 - Department: {emp['department']}
                 - Specialization: {emp['specialization']}
                 - Availability: {emp['availability']}
 
                 """
+                for emp in employees
+            )
 
             prompt = f"""
             You are an HR assistant helping to find the right employees for projects. 
@@ -174,7 +659,7 @@ class HRChatbot:
             relevant experience and skills.
             """
 
-            response = self.openai.chat.completion.create(
+            response = await self.openai_client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": "You are a helpful HR assistant."},
@@ -184,12 +669,21 @@ class HRChatbot:
                 temperature=0.7
             )
 
-            return response.choices[0].message.content
+            response_text = response.choices[0].message.content
+            self.cache_put(self.response_cache, cache_key, response_text, RESPONSE_CACHE_SIZE)
+            return response_text
 
         except Exception as e:
             logger.error(f"OpenAI API error: {e}")
             return self.generate_template_response(query, employees)
 
+    def cache_put(self, cache, key, value, max_size):
+        """Store a cache entry, evicting the least recently used one"""
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > max_size:
+            cache.popitem(last=False)
+
     def generate_template_response(self, query: str, employees: List[Dict]) -> str:
         """Generate template-based response when OpenAI is not available"""
         if len(employees) == 1:
@@ -210,24 +704,101 @@ Current availability: {emp['availability']}
 Would you like more details about their background or see other candidates?"""
 
         else:
-            response = f"""Based on your query "{query}", I found {len(employees)} excellent candidates:\n\n"""
-
-            for i, emp in enumerate(employees[:3], 1):  # Show top 3
-                skills_text = ", ".join(emp['skills'][:3])
-                response += f"""**{i}. {emp['name']}** ({emp['experience_years']} years experience)
-- Key skills: {skills_text}
+            header = f"""Based on your query "{query}", I found {len(employees)} excellent candidates:\n\n"""
+            candidates = [
+                f"""**{i}. {emp['name']}** ({emp['experience_years']} years experience)
+- Key skills: {', '.join(emp['skills'][:3])}
 - Specialization: {emp['specialization']}
 - Availability: {emp['availability']}
 
 """
+                for i, emp in enumerate(employees[:3], 1)  # Show top 3
+            ]
+            footer = f"\nI found {len(employees) - 3} more candidates. Would you like to see them?" if len(employees) > 3 else ""
 
-            if len(employees) > 3:
-                response += f"\nI found {len(employees) - 3} more candidates. Would you like to see them?"
+            response = "".join([header, *candidates, footer])
 
         return response
 
+class QueryBatcher:
+    """Coalesce concurrent chat queries into one batched search call"""
+
+    def __init__(self, search_batch, max_batch_size=BATCH_MAX_SIZE, max_wait=BATCH_MAX_WAIT):
+        self.search_batch = search_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = None
+        self.worker = None
+
+    def start(self):
+        """Start the background batching worker on the running event loop"""
+        self.queue = asyncio.Queue()
+        self.worker = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Cancel the background batching worker"""
+        if self.worker:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+
+    async def search(self, query: str, top_k: int = 5) -> List[Dict]:
+        """Queue a query and wait for its share of the next batch"""
+        if not self.worker:
+            results = await asyncio.to_thread(self.search_batch, [query], top_k)
+            return results[0]
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((query, top_k, future))
+        return await future
+
+    async def collect_batch(self):
+        """Wait for one query, then gather more until the batch window closes"""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        """Run batched encode + FAISS search and resolve each waiting request"""
+        while True:
+            batch = await self.collect_batch()
+            queries = [query for query, _, _ in batch]
+            top_k = max(k for _, k, _ in batch)
+
+            try:
+                # Encoding and FAISS search block, so run them off the event loop
+                results = await asyncio.to_thread(self.search_batch, queries, top_k)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, k, future), employees in zip(batch, results):
+                if not future.done():
+                    future.set_result(employees[:k])
+
+# The one-off ONNX export runs before the chatbot is built so it does not load
+# the model, embeddings or index cache first
+if __name__ == "__main__" and '--export-onnx' in sys.argv:
+    export_onnx_model()
+    sys.exit(0)
+
 # Initialize chatbot
 chatbot = HRChatbot()
+query_batcher = QueryBatcher(chatbot.search_employees_batch)
 
 # Pydantic models
 class ChatQuery(BaseModel):
@@ -246,6 +817,14 @@ class EmployeeSearchQuery(BaseModel):
     department: Optional[str] = None
     availability: Optional[str] = None
 
+@app.on_event("startup")
+async def start_query_batcher():
+    query_batcher.start()
+
+@app.on_event("shutdown")
+async def stop_query_batcher():
+    await query_batcher.stop()
+
 @app.get("/")
 async def root():
     return {"message": "HR Resource Query Chatbot API is running!"}
@@ -253,12 +832,15 @@ async def root():
 @app.post("/chat", response_model=ChatResponse)
 async def chat_with_bot(query: ChatQuery):
     """Main chat endpoint for natural language queries"""
+    if chatbot.model is None:
+        raise HTTPException(status_code=503, detail="Semantic search is disabled on this server")
+
     try:
-        # Search for relevant employees
-        relevant_employees = chatbot.search_employees(query.message, top_k=5)
+        # Search for relevant employees (batched with concurrent requests)
+        relevant_employees = await query_batcher.search(query.message, top_k=5)
 
         # Generate natural language response
-        response_text = chatbot.generate_response(query.message, relevant_employees)
+        response_text = await chatbot.generate_response(query.message, relevant_employees)
 
         session_id = query.session_id or "default_session"
 
@@ -282,39 +864,14 @@ async def search_employees(
 ):
     """Search employees with specific criteria"""
     try:
-        filtered_employees = chatbot.employees_data.copy()
-
-        # Apply filters
-        if skills:
-            skill_list = [s.strip().lower() for s in skills.split(',')]
-            filtered_employees = [
-                emp for emp in filtered_employees
-                if any(skill.lower() in [s.lower() for s in emp['skills']] for skill in skill_list)
-            ]
-
-        if experience_min:
-            filtered_employees = [
-                emp for emp in filtered_employees
-                if emp['experience_years'] >= experience_min
-            ]
-
-        if experience_max:
-            filtered_employees = [
-                emp for emp in filtered_employees
-                if emp['experience_years'] <= experience_max
-            ]
-
-        if department:
-            filtered_employees = [
-                emp for emp in filtered_employees
-                if department.lower() in emp['department'].lower()
-            ]
-
-        if availability:
-            filtered_employees = [
-                emp for emp in filtered_employees
-                if emp['availability'].lower() == availability.lower()
-            ]
+        skill_list = [s.strip() for s in skills.split(',')] if skills else None
+        filtered_employees = chatbot.filter_employees(
+            skills=skill_list,
+            experience_min=experience_min,
+            experience_max=experience_max,
+            department=department,
+            availability=availability
+        )
 
         return {"employees": filtered_employees, "count": len(filtered_employees)}
 
@@ -326,10 +883,12 @@ async def search_employees(
 async def get_employee(employee_id: int):
     """Get specific employee details"""
     try:
-        employee = next((emp for emp in chatbot.employees_data if emp['id'] == employee_id), None)
+        employee = chatbot.employees_by_id.get(employee_id)
         if not employee:
             raise HTTPException(status_code=404, detail="Employee not found")
         return employee
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get employee error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -338,25 +897,7 @@ async def get_employee(employee_id: int):
 async def get_stats():
     """Get database statistics"""
     try:
-        employees = chatbot.employees_data
-        departments = {}
-        skills_count = {}
-
-        for emp in employees:
-            # Count departments
-            dept = emp['department']
-            departments[dept] = departments.get(dept, 0) + 1
-
-            # Count skills
-            for skill in emp['skills']:
-                skills_count[skill] = skills_count.get(skill, 0) + 1
-
-        return {
-            "total_employees": len(employees),
-            "departments": departments,
-            "top_skills": dict(sorted(skills_count.items(), key=lambda x: x[1], reverse=True)[:10]),
-            "avg_experience": sum(emp['experience_years'] for emp in employees) / len(employees)
-        }
+        return chatbot.stats
     except Exception as e:
         logger.error(f"Stats error: {e}")
         raise HTTPException(status_code=500, detail=str(e))